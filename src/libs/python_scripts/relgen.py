@@ -1,19 +1,56 @@
 # FILE: scripts/relgen.py
-import subprocess
+import asyncio
+import hashlib
+import json
 import os
 import re
 # Removed argparse import
 import sys
+from pathlib import Path
+from typing import Optional
 from google import generativeai as genai
+from google.api_core import retry, retry_async
 
 # --- Constants ---
 GRADLE_FILE_PATH = os.path.join("android", "app", "build.gradle")
-LANG_TAG_EN = "<en-US>"
-LANG_TAG_AR = "<ar>"
-LANG_TAG_TR = "<tr-TR>"
-LANG_TAG_END_SUFFIX = "</"
+RELEASE_NOTE_TAGS = {'en': "en-US", 'ar': "ar", 'tr': "tr-TR"} # Play Store locale tag per note, in output order
+TRANSLATION_LANGUAGES = {'ar': "Arabic", 'tr': "Turkish"} # Notes translated from the English one
 DEFAULT_NUM_COMMITS = 5 # Default value if user enters nothing or invalid input
+COMMIT_BATCH_START = 10 # First git log batch size; doubled until the budget or the requested count is reached
+COMMIT_TEXT_BUDGET = 8 * 1024 # Max total characters of commit subjects sent to Gemini
 LATEST_RELEASE_NOTE_FILE = "latest-release-note.txt" # Output file name
+NOTES_CACHE_VERSION = 1 # Bump to invalidate cached notes when the cache format changes
+LOCAL_CACHE_DIR = ".relgen_cache" # Last resort when neither XDG_CACHE_HOME nor the home directory is available
+GEMINI_MODEL_NAME = 'gemini-1.5-flash-latest' # Using 1.5 flash
+# Exponential backoff on transient API errors (429/500/503...), so a flaky network doesn't force a full rerun
+_RETRY = retry_async.AsyncRetry(initial=1.0, maximum=10.0, multiplier=2.0, timeout=60.0, predicate=retry.if_transient_error)
+_VC_RE = re.compile(r'(\bversionCode\s+(?:=)?\s*)(\d+)') # Made = optional, added optional space
+
+# --- Prompts ---
+# Stable instruction prefixes; only the commit list / note text changes per run.
+
+RELEASE_NOTE_INSTRUCTION = """You write release notes for a mobile app.
+The user message is a list of recent git commit messages, one per line.
+Analyze them and write a release note for them.
+
+Requirements:
+- Write a user-friendly release note summary in English, suitable for the Google Play Store.
+- Keep it concise and easy for non-technical users to understand.
+- Focus on the user-visible changes or improvements.
+- Use very few emojis, if any.
+- Do NOT use any markdown formatting (like *, -, #) or HTML tags in the content of the note.
+- The note should be a paragraph of text.
+
+Output only the release note text. Do not include any other text, explanations, or markdown before or after it.
+"""
+
+TRANSLATION_INSTRUCTION = """You translate Google Play Store release notes.
+The user message gives a target language and a release note.
+- Keep the meaning, tone and emojis of the original.
+- Do NOT use any markdown formatting (like *, -, #) or HTML tags.
+
+Output only the translated text. Do not include any other text, explanations, or markdown before or after it.
+"""
 
 # --- Helper Functions ---
 
@@ -26,52 +63,80 @@ def get_api_key():
         sys.exit(1)
     return api_key
 
-def get_last_commits(n: int) -> list[str]:
+def env_flag(name: str) -> bool:
+    """Reads a boolean environment variable; anything but unset/empty/0/false/no counts as set."""
+    return os.environ.get(name, "").lower() not in ("", "0", "false", "no")
+
+def is_verbose() -> bool:
+    """Checks whether to print interactive output (stdout is a terminal, or RELGEN_VERBOSE is set)."""
+    return sys.stdout.isatty() or env_flag("RELGEN_VERBOSE")
+
+async def get_last_commits(n: int) -> list[str]:
     """Gets the subject lines of the last n git commits."""
     if n <= 0:
         print("Error: Number of commits must be positive.", file=sys.stderr)
         return []
     try:
-        result = subprocess.run(
-            ["git", "log", f"-{n}", "--pretty=format:%s"],
-            capture_output=True,
-            text=True,
-            check=True,
-            encoding='utf-8' # Explicitly set encoding
+        proc = await asyncio.create_subprocess_exec(
+            # -s / --no-decorate / --no-color keep the output to bare subject lines, whatever the user's git config
+            "git", "--no-pager", "log", f"-{n}", "-s", "--no-decorate", "--no-color", "--format=%s",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env={"GIT_OPTIONAL_LOCKS": "0", **os.environ}, # Don't take optional locks (e.g. index refresh)
         )
-        commits = result.stdout.strip().split("\n")
-        commits = [commit for commit in commits if commit.strip()] # Ensure commits are not just whitespace
+        stdout, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            print(f"Error running git log: exit status {proc.returncode}", file=sys.stderr)
+            print(f"Stderr: {stderr.decode('utf-8', 'replace')}", file=sys.stderr)
+            print("Are you in a git repository? Do you have any commits?", file=sys.stderr)
+            sys.exit(1)
+        # Filter on raw bytes and only decode the lines we keep
+        lines = [line.strip() for line in stdout.splitlines()]
+        commits = [line.decode('utf-8', 'replace') for line in lines if line] # Ensure commits are not just whitespace
         if not commits:
              print("Warning: No non-empty commit messages found for the last {} commits.".format(n), file=sys.stderr)
              return []
-        print(f"Fetched {len(commits)} commit messages.")
         return commits
     except FileNotFoundError:
         print("Error: 'git' command not found. Make sure Git is installed and in your PATH.", file=sys.stderr)
         sys.exit(1)
-    except subprocess.CalledProcessError as e:
-        print(f"Error running git log: {e}", file=sys.stderr)
-        print(f"Stderr: {e.stderr}", file=sys.stderr)
-        print("Are you in a git repository? Do you have any commits?", file=sys.stderr)
-        sys.exit(1)
     except Exception as e:
         print(f"An unexpected error occurred while fetching commits: {e}", file=sys.stderr)
         sys.exit(1)
 
 
-def increment_version_code(file_path: str) -> int:
-    """Increments the versionCode in the specified build.gradle file."""
-    if not os.path.exists(file_path):
-        print(f"Error: Gradle file not found at {file_path}", file=sys.stderr)
-        print("Please ensure you are running this script from the root of your Expo/React Native project.", file=sys.stderr)
-        sys.exit(1)
+async def collect_commits(max_commits: int) -> list[str]:
+    """Gets up to max_commits commit subjects, doubling the git log batch until the text budget is hit."""
+    batch = min(COMMIT_BATCH_START, max_commits)
+    while True:
+        commits = await get_last_commits(batch)
+        total_size = sum(len(commit) for commit in commits)
+        # Stop once over budget, out of history, or at the requested count
+        if total_size >= COMMIT_TEXT_BUDGET or len(commits) < batch or batch >= max_commits:
+            break
+        batch = min(batch * 2, max_commits)
+
+    # Keep the newest commits that fit in the budget (always at least one)
+    kept_size = 0
+    for kept, commit in enumerate(commits):
+        kept_size += len(commit)
+        if kept and kept_size > COMMIT_TEXT_BUDGET:
+            print(f"Warning: Using only the latest {kept} commits to keep the prompt under {COMMIT_TEXT_BUDGET} characters.", file=sys.stderr)
+            commits = commits[:kept]
+            break
+
+    if commits:
+        print(f"Fetched {len(commits)} commit messages.")
+    return commits
+
 
+def compute_new_version_code(file_path: str) -> tuple[int, int, str]:
+    """Reads build.gradle and returns (current versionCode, new versionCode, updated content), without writing it."""
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
 
-        pattern = r'(\bversionCode\s+(?:=)?\s*)(\d+)' # Made = optional, added optional space
-        match = re.search(pattern, content)
+        match = _VC_RE.search(content)
 
         if not match:
             print(f"Error: Could not find 'versionCode' in {file_path}", file=sys.stderr)
@@ -81,36 +146,129 @@ def increment_version_code(file_path: str) -> int:
         current_version_code = int(match.group(2))
         new_version_code = current_version_code + 1
 
-        new_content = re.sub(pattern, rf'\g<1>{new_version_code}', content, count=1)
-
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
+        # Splice the new number in at the matched span instead of re-scanning with re.sub
+        start, end = match.span(2)
+        new_content = content[:start] + str(new_version_code) + content[end:]
 
-        print(f"Incremented versionCode in {file_path} from {current_version_code} to {new_version_code}")
-        return new_version_code
+        return current_version_code, new_version_code, new_content
 
-    except FileNotFoundError: # Should be caught by os.path.exists, but good to have
+    except FileNotFoundError:
         print(f"Error: Gradle file not found at {file_path}", file=sys.stderr)
+        print("Please ensure you are running this script from the root of your Expo/React Native project.", file=sys.stderr)
         sys.exit(1)
     except Exception as e:
         print(f"Error processing gradle file {file_path}: {e}", file=sys.stderr)
         sys.exit(1)
 
-def generate_content_with_gemini(prompt: str, api_key: str) -> str:
-    """Generates content using the Gemini API. Assumes genai is configured."""
+def commit_version_code(file_path: str) -> tuple[int, int]:
+    """Increments versionCode in build.gradle and writes it, returning (old, new) versionCode."""
+    # Re-read the file rather than reusing content computed earlier, so edits made meanwhile aren't lost
+    current_version_code, new_version_code, new_content = compute_new_version_code(file_path)
+    tmp_path = f"{file_path}.tmp"
     try:
-        # Genai should be configured in main or once globally
-        model = genai.GenerativeModel('gemini-1.5-flash-latest') # Using 1.5 flash
-        response = model.generate_content(prompt)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(new_content)
+        os.replace(tmp_path, file_path) # Atomic, so build.gradle is never left half-written
+    except Exception as e:
+        print(f"Error writing gradle file {file_path}: {e}", file=sys.stderr)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        sys.exit(1)
+    return current_version_code, new_version_code
+
+def get_cache_dir() -> str:
+    """Returns the directory used to cache generated notes."""
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME")
+    if xdg_cache_home:
+        return os.path.join(xdg_cache_home, "epu", "relgen")
+    home = os.path.expanduser("~")
+    if home != "~": # expanduser returns the input unchanged when the home directory can't be resolved
+        return os.path.join(home, ".cache", "epu", "relgen") # XDG default
+    return LOCAL_CACHE_DIR
+
+def is_cache_disabled() -> bool:
+    """Checks whether the notes cache is bypassed via RELGEN_NO_CACHE."""
+    return env_flag("RELGEN_NO_CACHE")
+
+def get_cache_key(commit_list_str: str) -> str:
+    """Hashes the commit list together with everything else that shapes the generated notes."""
+    # Prompt, model or language changes must not be served notes generated under the old settings
+    key_source = "\0".join([
+        f"v{NOTES_CACHE_VERSION}",
+        GEMINI_MODEL_NAME,
+        RELEASE_NOTE_INSTRUCTION,
+        TRANSLATION_INSTRUCTION,
+        json.dumps(TRANSLATION_LANGUAGES, sort_keys=True),
+        commit_list_str,
+    ])
+    return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+def load_cached_notes(key: str) -> Optional[dict[str, str]]:
+    """Loads previously generated notes for the given commit-list hash, if any."""
+    cache_path = os.path.join(get_cache_dir(), f"{key}.json")
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            notes = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Warning: Ignoring unreadable cache file {cache_path}: {e}", file=sys.stderr)
+        return None
 
-        text_content = None
+    if not isinstance(notes, dict) or not notes.get('en'):
+        return None
+    return notes
+
+def save_cached_notes(key: str, notes: dict[str, str]) -> None:
+    """Stores generated notes for the given commit-list hash. Failures are non-fatal."""
+    cache_dir = get_cache_dir()
+    cache_path = os.path.join(cache_dir, f"{key}.json")
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(notes, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path) # Atomic, so a crash never leaves a half-written entry
+    except OSError as e:
+        print(f"Warning: Could not write notes cache {cache_path}: {e}", file=sys.stderr)
         try:
-            if response.text: # Prioritize .text if available
-                 text_content = response.text.strip()
-        except ValueError: # .text can raise ValueError if content is blocked
-             print("Warning: Accessing response.text failed (possibly due to content blocking). Checking candidates.", file=sys.stderr)
-        except AttributeError: # If response object doesn't have .text
-             print("Warning: response.text attribute not found. Checking candidates.", file=sys.stderr)
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+_MODELS: dict[Optional[str], genai.GenerativeModel] = {}
+
+def _model(system_instruction: Optional[str] = None) -> genai.GenerativeModel:
+    """Returns the shared GenerativeModel for a system instruction, creating it on first use."""
+    # Genai should be configured in main before the first call
+    # The fixed instructions go in the system instruction so the request prefix stays identical between runs
+    model = _MODELS.get(system_instruction)
+    if model is None:
+        model = genai.GenerativeModel(GEMINI_MODEL_NAME, system_instruction=system_instruction)
+        _MODELS[system_instruction] = model
+    return model
+
+async def generate_content_with_gemini(prompt: str, api_key: str, system_instruction: Optional[str] = None, show_progress: bool = False) -> str:
+    """Generates content using the Gemini API. Assumes genai is configured."""
+    try:
+        model = _model(system_instruction)
+        response = await model.generate_content_async(prompt, stream=True, request_options={'retry': _RETRY})
+
+        # Consume the stream as it arrives, optionally printing a dot per chunk as progress feedback
+        chunks = []
+        async for chunk in response:
+            try:
+                chunks.append(chunk.text)
+            except ValueError: # .text raises ValueError for chunks without text parts (e.g. blocked content)
+                pass
+            if show_progress:
+                print(".", end="", flush=True)
+
+        text_content = "".join(chunks).strip() or None
+        if text_content is None:
+             print("\nWarning: Streamed response contained no text (possibly due to content blocking). Checking candidates.", file=sys.stderr)
 
 
         if text_content is None and response.candidates:
@@ -135,81 +293,55 @@ def generate_content_with_gemini(prompt: str, api_key: str) -> str:
         # You might want to print more details from 'e' if it's a specific API error type
         return ""
 
-def generate_and_translate_notes(commits: list[str], api_key: str) -> dict[str, str]:
-    """Generates and translates release notes in a single API call."""
-    commit_list_str = "\n".join(f"- {commit}" for commit in commits) # Use \n for newlines in prompt
-
-    prompt = f"""Analyze the following recent git commit messages and perform the tasks below:
-
-Commit Messages:
-{commit_list_str}
-
-Tasks:
-1.  Generate a user-friendly release note summary in English, suitable for the Google Play Store.
-    - Keep it concise and easy for non-technical users to understand.
-    - Focus on the user-visible changes or improvements.
-    - Use very few emojis, if any.
-    - Do NOT use any markdown formatting (like *, -, #) or HTML tags in the content of the notes.
-    - Each note should be a paragraph of text.
-2.  Translate the generated English release note into Arabic.
-3.  Translate the generated English release note into Turkish.
-4.  Format the output *exactly* as follows, including the language tags, with each note on its own set of lines:
-    {LANG_TAG_EN}
-    [English release note here]
-    {LANG_TAG_EN.replace('<','</')}
-    {LANG_TAG_AR}
-    [Arabic translation here]
-    {LANG_TAG_AR.replace('<','</')}
-    {LANG_TAG_TR}
-    [Turkish translation here]
-    {LANG_TAG_TR.replace('<','</')}
-
-Output only the formatted notes with the tags. Do not include any other text, explanations, or markdown before or after this structure.
-"""
-    print("\nGenerating and translating release notes (single API call to Gemini)...")
-    full_response = generate_content_with_gemini(prompt, api_key)
-
-    if not full_response:
-        print("Error: Failed to get a valid response from Gemini.", file=sys.stderr)
-        return {}
+async def gen_en(commit_list_str: str, api_key: str) -> str:
+    """Generates the English release note from the formatted commit list."""
+    note = await generate_content_with_gemini(commit_list_str, api_key, RELEASE_NOTE_INSTRUCTION, show_progress=is_verbose())
+    if is_verbose():
+        print() # End the progress dots line
+    return note
+
+async def translate(text: str, language: str, api_key: str) -> str:
+    """Translates a release note into the given language."""
+    prompt = f"Target language: {language}\n\nRelease note:\n{text}"
+    # No per-chunk dots here: the translations run concurrently and their dots would interleave
+    translated_note = await generate_content_with_gemini(prompt, api_key, TRANSLATION_INSTRUCTION)
+    if translated_note and is_verbose():
+        print(f"  {language} translation received.")
+    return translated_note
+
+async def generate_and_translate_notes(commits: list[str], api_key: str) -> dict[str, str]:
+    """Generates the English release note, then translates it with concurrent API calls."""
+    commit_list_str = "- " + "\n- ".join(commits) # Commits are already stripped by get_last_commits
+
+    cache_key = get_cache_key(commit_list_str)
+    use_cache = not is_cache_disabled()
+    if use_cache:
+        cached_notes = load_cached_notes(cache_key)
+        if cached_notes:
+            print("\nUsing cached release notes for these commits (set RELGEN_NO_CACHE=1 to regenerate).")
+            return cached_notes
+
+    print("\nGenerating English release notes (Gemini)...")
+    en_note = await gen_en(commit_list_str, api_key)
+
+    if not en_note:
+         print("Error: Failed to get a valid English release note from Gemini.", file=sys.stderr)
+         return {} # English note is critical
 
-    notes = {}
-    try:
-        # Regex to find content within tags, handling potential whitespace/newlines
-        # Using re.DOTALL so '.' matches newlines. Using non-greedy '.*?'
-        en_match = re.search(rf'{re.escape(LANG_TAG_EN)}(.*?){re.escape(LANG_TAG_EN.replace("<","</"))}', full_response, re.DOTALL)
-        ar_match = re.search(rf'{re.escape(LANG_TAG_AR)}(.*?){re.escape(LANG_TAG_AR.replace("<","</"))}', full_response, re.DOTALL)
-        tr_match = re.search(rf'{re.escape(LANG_TAG_TR)}(.*?){re.escape(LANG_TAG_TR.replace("<","</"))}', full_response, re.DOTALL)
-
-        if en_match:
-            notes['en'] = en_match.group(1).strip()
-        else:
-             print(f"Warning: Could not parse English note ({LANG_TAG_EN}) from Gemini response.", file=sys.stderr)
+    print("Translating release notes into {} (parallel API calls to Gemini)...".format(" and ".join(TRANSLATION_LANGUAGES.values())))
+    translations = await asyncio.gather(
+        *(translate(en_note, language, api_key) for language in TRANSLATION_LANGUAGES.values())
+    )
 
-        if ar_match:
-            notes['ar'] = ar_match.group(1).strip()
+    notes = {'en': en_note}
+    for (lang, language), translated_note in zip(TRANSLATION_LANGUAGES.items(), translations):
+        if translated_note:
+            notes[lang] = translated_note
         else:
-            print(f"Warning: Could not parse Arabic note ({LANG_TAG_AR}) from Gemini response.", file=sys.stderr)
+            print(f"Warning: Could not get {language} translation from Gemini.", file=sys.stderr)
 
-        if tr_match:
-            notes['tr'] = tr_match.group(1).strip()
-        else:
-             print(f"Warning: Could not parse Turkish note ({LANG_TAG_TR}) from Gemini response.", file=sys.stderr)
-
-    except Exception as e:
-        print(f"Error parsing Gemini response: {e}", file=sys.stderr)
-        print("--- Raw Gemini Response ---", file=sys.stderr)
-        print(full_response, file=sys.stderr)
-        print("---------------------------", file=sys.stderr)
-        # Return what we have, even if partial, or empty if critical
-        return notes
-
-    if 'en' not in notes or not notes['en']:
-         print("Error: Failed to extract mandatory English note from Gemini response.", file=sys.stderr)
-         print("--- Raw Gemini Response ---", file=sys.stderr)
-         print(full_response, file=sys.stderr)
-         print("---------------------------", file=sys.stderr)
-         return {} # English note is critical
+    if use_cache and all(lang in notes for lang in TRANSLATION_LANGUAGES): # Don't cache partial results
+        save_cached_notes(cache_key, notes)
 
     return notes
 
@@ -221,10 +353,10 @@ def get_commit_count_from_user() -> int:
             if not user_input:
                 return DEFAULT_NUM_COMMITS
             num_commits = int(user_input)
-            if num_commits > 0 and num_commits < 50: # Added an upper sanity limit
+            if num_commits > 0: # Large counts are trimmed to COMMIT_TEXT_BUDGET by collect_commits
                 return num_commits
             else:
-                print("Please enter a positive number (e.g., 1-49).")
+                print("Please enter a positive number.")
         except ValueError:
             print("Invalid input. Please enter a whole number.")
         except EOFError:
@@ -234,64 +366,88 @@ def get_commit_count_from_user() -> int:
 
 # --- Main Execution ---
 
-def main():
+async def main():
     print("--- Release Note Generator (relgen.py) ---")
     api_key = get_api_key()
+
+    num_commits = get_commit_count_from_user()
+
+    # Start git log right away so it runs while the Gemini client is being set up
+    commits_task = asyncio.create_task(collect_commits(num_commits))
+    await asyncio.sleep(0) # Yield once so the task actually spawns the git process before we block on configure
+
     try:
          genai.configure(api_key=api_key)
+         # Create the models up front so that setup overlaps with git log, not with generation
+         _model(RELEASE_NOTE_INSTRUCTION)
+         _model(TRANSLATION_INSTRUCTION)
          print("Gemini API configured.")
     except Exception as e:
          print(f"Error configuring Gemini API: {e}", file=sys.stderr)
          sys.exit(1)
 
-    num_commits = get_commit_count_from_user()
-
-    commits = get_last_commits(num_commits)
+    commits = await commits_task
 
     if not commits:
         print("No commit messages found or fetched. Cannot generate release notes. Exiting.", file=sys.stderr)
         sys.exit(1)
 
-    increment_version_code(GRADLE_FILE_PATH) # This is android/app/build.gradle
+    # Compute the bump now (so a broken gradle file fails fast) but only write it once the notes file is written,
+    # so a failed run can be retried without bumping versionCode twice
+    current_version_code, new_version_code, _ = compute_new_version_code(GRADLE_FILE_PATH) # This is android/app/build.gradle
+    print(f"versionCode in {GRADLE_FILE_PATH} will be incremented from {current_version_code} to {new_version_code}")
 
-    notes = generate_and_translate_notes(commits, api_key)
+    notes = await generate_and_translate_notes(commits, api_key)
 
     if not notes or 'en' not in notes or not notes['en']:
         print("Failed to generate essential release notes. Please check Gemini output/errors. Exiting.", file=sys.stderr)
+        print(f"versionCode in {GRADLE_FILE_PATH} was left unchanged.", file=sys.stderr)
         sys.exit(1)
 
-    en_note = notes.get('en', "Error: English note missing.")
     # Fallback to English if translation is missing or failed
-    ar_note = notes.get('ar', en_note if 'ar' not in notes else "Error: Arabic translation missing.")
-    tr_note = notes.get('tr', en_note if 'tr' not in notes else "Error: Turkish translation missing.")
-
-
-    if ar_note == en_note and 'ar' not in notes and 'en' in notes : # More specific warning
-         print("Warning: Using English text as fallback for Arabic translation.", file=sys.stderr)
-    if tr_note == en_note and 'tr' not in notes and 'en' in notes:
-         print("Warning: Using English text as fallback for Turkish translation.", file=sys.stderr)
+    for lang, language in TRANSLATION_LANGUAGES.items():
+        if not notes.get(lang):
+            print(f"Warning: Using English text as fallback for {language} translation.", file=sys.stderr)
+            notes[lang] = notes['en']
 
     # Prepare the final output string
-    output_string_parts = [
-        LANG_TAG_EN, en_note, LANG_TAG_EN.replace('<','</'),
-        LANG_TAG_AR, ar_note, LANG_TAG_AR.replace('<','</'),
-        LANG_TAG_TR, tr_note, LANG_TAG_TR.replace('<','</')
-    ]
-    final_output_string = '\n'.join(output_string_parts)
+    final_output_string = '\n'.join(
+        f"<{tag}>\n{notes[lang]}\n</{tag}>" for lang, tag in RELEASE_NOTE_TAGS.items()
+    )
 
+    output_path = Path(LATEST_RELEASE_NOTE_FILE)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
     try:
-        with open(LATEST_RELEASE_NOTE_FILE, 'w', encoding='utf-8') as file:
-            file.write(final_output_string)
+        with tmp_path.open('w', encoding='utf-8') as f:
+            f.write(final_output_string)
+            f.flush()
+            os.fsync(f.fileno()) # Data must be on disk before the rename, or a power loss can leave an empty file
+        os.replace(tmp_path, output_path) # Atomic, so a crash never leaves a truncated notes file
         print(f"\n✅ Release notes successfully written to ./{LATEST_RELEASE_NOTE_FILE}")
-    except IOError as e:
+    except OSError as e:
         print(f"Error writing release notes to file ./{LATEST_RELEASE_NOTE_FILE}: {e}", file=sys.stderr)
+        try:
+            tmp_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+        # Don't lose the generated notes: dump them where they'll always be seen
+        print("\n--- Play Store Release Notes (NOT saved) ---", file=sys.stderr)
+        print(final_output_string, file=sys.stderr)
+        print("--------------------------------------------", file=sys.stderr)
+        print(f"versionCode in {GRADLE_FILE_PATH} was left unchanged.", file=sys.stderr)
+        sys.exit(1)
 
+    # Only bump versionCode once the notes are safely on disk, so any failed run can simply be rerun
+    current_version_code, new_version_code = commit_version_code(GRADLE_FILE_PATH)
+    print(f"Incremented versionCode in {GRADLE_FILE_PATH} from {current_version_code} to {new_version_code}")
 
-    print("\n--- Play Store Release Notes (also saved to {}) ---".format(LATEST_RELEASE_NOTE_FILE))
-    print(final_output_string)
-    print("----------------------------------------------------")
+    # Only echo the notes when someone is watching (or RELGEN_VERBOSE is set), not into CI logs
+    if is_verbose():
+        print("\n--- Play Store Release Notes (also saved to {}) ---".format(LATEST_RELEASE_NOTE_FILE))
+        print(final_output_string)
+        print("----------------------------------------------------")
     print("Process completed.")
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())